@@ -5,122 +5,518 @@ import sys
 from pathlib import Path
 import json
 import re
+import mmap
+import heapq
+import operator
+import gzip
+import hashlib
 from datetime import datetime, timedelta
-from collections import defaultdict, Counter
-from flask import Flask, render_template_string, jsonify, request, send_file
+from collections import Counter
+from itertools import compress, repeat
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+try:
+    # orjson parses structured log lines several times faster when installed
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    # Production WSGI server; Flask's development server is used without it
+    from waitress import serve
+except ImportError:
+    serve = None
+from flask import Flask, Response, jsonify, request
 import threading
 import time
 import csv
-import io
 
 # Configuration
 LOG_FILE = "/var/log/dns-fallback.log"
 DASHBOARD_PORT = 8053
 DASHBOARD_HOST = "0.0.0.0"
+DASHBOARD_THREADS = 8  # request threads when served by waitress
+TRUNCATE_CHECK_BYTES = 1024 * 1024  # re-stat the log this often while scanning it
+PARSE_WORKERS = os.cpu_count() or 1  # processes for parsing large stretches of the log
+PARALLEL_SCAN_BYTES = 8 * 1024 * 1024  # block size the backwards scan hands to them
+MAX_SCAN_BYTES = 64 * 1024 * 1024  # how far back from the end of the log windows are read
 
 app = Flask(__name__)
 
+# CDN domains tracked separately in the analytics; subdomains count too
+CDN_DOMAINS = frozenset({'cloudfront.net', 'fastly.com', 'amazonaws.com', 'akamai.net', 'cloudflare.com'})
+
+# Small integer codes for resolvers, assigned at parse time so aggregation
+# compares and counts ints instead of strings
+RESOLVER_UNBOUND, RESOLVER_FALLBACK, RESOLVER_BYPASSED, RESOLVER_OTHER = range(4)
+RESOLVER_CODES = {'unbound': RESOLVER_UNBOUND, 'fallback': RESOLVER_FALLBACK, 'bypassed': RESOLVER_BYPASSED}
+
+def atomic(name, pattern):
+    """Wrap a regex step so it is never re-entered on backtracking
+
+    (?=(?P<name>...))(?P=name) behaves like an atomic group on every Python
+    version: a lookahead that matched is not retried, and the backreference
+    consumes exactly what it matched.
+    """
+    return b'(?=(?P<%s>%s))(?P=%s)' % (name.encode(), pattern, name.encode())
+
+# Legacy text log entries, matched as raw bytes by one compiled alternation
+# anchored on the leading asctime stamp: lines without one are rejected at the
+# first byte, and the name of the alternative that matched gives the entry type.
+# Only the captured fields are decoded. Every "skip to the next field" step is
+# atomic: each field is taken from its first occurrence, so a line that does
+# not match fails in linear time instead of retrying every combination of
+# later occurrences.
+LEGACY_LOG_PATTERN = re.compile(
+    rb'^(?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+)(?:'
+    # DNS_QUERY structured logs in text format
+    rb'(?P<dns_query>' +
+    atomic('dq_tag', rb'[^\n]*?DNS_QUERY') +
+    atomic('dq_domain', rb'[^\n]*?domain: (?P<domain>\S+)') +
+    atomic('dq_client', rb'[^\n]*?client: (?P<client>\S+)') +
+    atomic('dq_resolver', rb'[^\n]*?resolver: (?P<resolver>\S+)') +
+    atomic('dq_response_time', rb'[^\n]*?response_time: (?P<response_time>[\d.]+)') +
+    atomic('dq_query_type', rb'[^\n]*?query_type: (?P<query_type>\S+)') +
+    rb'[^\n]*?success: (?P<success>\w+))'
+    # Fallback/failure events
+    rb'|(?P<fallback_switch>[^\n]*?Switching to fallback server: (?P<fallback_server>\S+))'
+    rb'|(?P<primary_restored>' + atomic('pr_tag', rb'[^\n]*?Primary DNS') + rb'[^\n]*?is healthy again)'
+    rb'|(?P<domain_bypassed>' + atomic('db_domain', rb'[^\n]*?Domain (?P<bypassed_domain>\S+) bypassed') +
+    rb'[^\n]*?repeated Unbound failures)'
+    # Health check failures
+    rb'|(?P<health_failure>[^\n]*?DNS server (?P<failed_server>\S+) failed health check)'
+    rb')'
+)
+# Event type -> group holding its details
+LEGACY_EVENT_DETAILS = {
+    'fallback_switch': 'fallback_server',
+    'primary_restored': None,
+    'domain_bypassed': 'bypassed_domain',
+    'health_failure': 'failed_server',
+}
+
+def percentiles(data, points):
+    """Linearly interpolated percentiles of an already sorted list"""
+    if not data:
+        return [0] * len(points)
+    last = len(data) - 1
+    results = []
+    for p in points:
+        k = last * p / 100
+        f = int(k)
+        c = k - f
+        results.append(data[f] * (1 - c) + data[f + 1] * c if f < last else data[f])
+    return results
+
+def is_cdn_domain(domain):
+    """Check a lower-cased domain and each of its parent domains against CDN_DOMAINS"""
+    while True:
+        if domain in CDN_DOMAINS:
+            return True
+        dot = domain.find('.')
+        if dot < 0:
+            return False
+        domain = domain[dot + 1:]
+
+class QueryColumns:
+    """Parsed DNS queries stored column-wise, one sequence per field
+
+    String fields are plain lists; numeric fields are packed arrays, so a
+    query costs a few bytes per field instead of a dict per record.
+    """
+    def __init__(self):
+        self.timestamps = []
+        self.domains = []
+        self.clients = []
+        self.resolvers = []
+        self.query_types = []
+        self.resolver_codes = array('B')
+        self.response_times = array('d')
+        self.successes = array('B')
+        self.cdn = array('B')
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def _columns(self):
+        return (self.timestamps, self.domains, self.clients, self.resolvers, self.query_types,
+                self.resolver_codes, self.response_times, self.successes, self.cdn)
+
+    def append(self, query):
+        self.timestamps.append(query['timestamp'])
+        self.domains.append(query['domain'])
+        self.clients.append(query['client'])
+        self.resolvers.append(query['resolver'])
+        self.query_types.append(query['query_type'])
+        self.resolver_codes.append(query['resolver_code'])
+        self.response_times.append(query['response_time'])
+        self.successes.append(bool(query['success']))
+        self.cdn.append(query['cdn'])
+
+    def reverse(self):
+        for column in self._columns():
+            column.reverse()
+
+    def prepend(self, older):
+        """Put the queries of an older QueryColumns in front of these"""
+        (self.timestamps, self.domains, self.clients, self.resolvers, self.query_types,
+         self.resolver_codes, self.response_times, self.successes, self.cdn) = (
+            old + new for old, new in zip(older._columns(), self._columns()))
+
+    def window_start(self, cutoff_time):
+        """Index of the oldest query newer than cutoff_time, scanning back from the newest"""
+        timestamps = self.timestamps
+        start = len(timestamps)
+        while start and timestamps[start - 1] > cutoff_time:
+            start -= 1
+        return start
+
+    def rows(self, start):
+        """Iterate query fields as tuples from index start onwards, in _columns order"""
+        return zip(*(column[start:] for column in self._columns()))
+
+def parse_log_range(log_file_path, start, end):
+    """Parse the complete lines in bytes [start, end) of a log, in a worker process
+
+    Returns (QueryColumns, events) in file order. The range is read rather
+    than memory-mapped so a concurrent truncation only shortens it.
+    """
+    analyzer = EnhancedLogAnalyzer(log_file_path)
+    queries = QueryColumns()
+    events = []
+    with open(log_file_path, 'rb') as f:
+        data = os.pread(f.fileno(), end - start, start)
+    for line in data.split(b'\n'):
+        parsed = analyzer._parse_line(line)
+        if parsed:
+            if 'domain' in parsed:
+                queries.append(parsed)
+            else:
+                events.append(parsed)
+    return queries, events
+
+class CSVLine:
+    """Minimal file object for csv.writer that keeps only the last row written"""
+    value = ''
+
+    def write(self, value):
+        self.value = value
+
 class EnhancedLogAnalyzer:
     def __init__(self, log_file_path):
         self.log_file_path = log_file_path
-        self.cache = {}
-        self.cache_time = None
-        self.cache_duration = 30  # seconds
-        self.lock = threading.Lock()
+        self.cache = {}  # hours -> (time, analytics, json body, etag)
+        self.cache_duration = 30  # seconds before an entry is refreshed
+        self.cache_expiry = 600  # seconds before an unused entry is dropped
+        self.lock = threading.Lock()  # guards the parsed records below
+        self._refresh_lock = threading.Lock()
+        self._refreshing = set()  # windows being recomputed in the background
+        # Last parsed second-granularity timestamp; log lines arrive in
+        # bursts that share the same second
+        self._ts_cache_key = None
+        self._ts_cache_val = None
+        # Incrementally parsed records, in file order, and the byte range of
+        # the log they were read from; see _refresh_records
+        self._reset_records()
+        self._log_identity = None
 
-    def _parse_structured_log(self, line):
-        """Parse structured JSON log entries"""
+    def _reset_records(self):
+        """Forget everything parsed so far, e.g. after the log was rotated"""
+        self._queries = QueryColumns()
+        self._events = []
+        self._head_offset = None  # start of the oldest parsed line
+        self._tail_offset = None  # end of the newest complete parsed line
+        self._covered_from = None  # cutoff the backwards scan stopped at
+
+    def _parse_line(self, line):
+        """Parse one raw log line; JSON lines are told apart by their first byte"""
+        if line[:1] == b'{':
+            try:
+                return self._parse_structured_log(line)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # Malformed JSON (JSONDecodeError is a ValueError) or fields
+                # of the wrong type
+                return None
+        return self._parse_legacy_log(line)
+
+    def _refresh_records(self, cutoff_time):
+        """Bring the parsed records up to date with the log file
+
+        Only bytes appended since the last refresh are parsed. The first
+        refresh walks backwards from the end of the log until cutoff_time,
+        and a later request for a wider window continues backwards from
+        where that scan stopped. Trailing partial lines are left for the
+        next refresh. The log is memory-mapped; logrotate truncates it in
+        place (copytruncate), so a shrinking file resets the records and
+        the backwards scan re-checks the size as it goes.
+        """
+        with open(self.log_file_path, 'rb') as f:
+            fd = f.fileno()
+            st = os.fstat(fd)
+            identity = (st.st_dev, st.st_ino)
+            if identity != self._log_identity or (self._tail_offset or 0) > st.st_size:
+                self._reset_records()
+                self._log_identity = identity
+            if not st.st_size:
+                return
+
+            with mmap.mmap(fd, st.st_size, access=mmap.ACCESS_READ) as mm:
+                end = mm.rfind(b'\n') + 1  # complete lines only
+                if self._tail_offset is None:
+                    self._head_offset = self._tail_offset = end
+
+                # New lines appended since the last refresh
+                if end > self._tail_offset:
+                    for line in mm[self._tail_offset:end].split(b'\n'):
+                        parsed = self._parse_line(line)
+                        if parsed:
+                            if 'domain' in parsed:
+                                self._queries.append(parsed)
+                            else:
+                                self._events.append(parsed)
+                    self._tail_offset = end
+
+                # Older lines, when the window reaches past what was scanned
+                if self._head_offset and (self._covered_from is None or cutoff_time < self._covered_from):
+                    self._scan_backwards(mm, fd, st.st_size, cutoff_time)
+
+    def _scan_backwards(self, mm, fd, size, cutoff_time):
+        """Parse lines before _head_offset, newest first, down to cutoff_time
+
+        Lines more than MAX_SCAN_BYTES before the end of the parsed log are
+        never read, so a very large log bounds the work of a wide window.
+        """
+        end = self._head_offset
+        floor = 0
+        if self._tail_offset > MAX_SCAN_BYTES:
+            floor = mm.find(b'\n', self._tail_offset - MAX_SCAN_BYTES) + 1
+        blocks, end, truncated = self._scan_blocks(mm, fd, size, end, floor, cutoff_time)
+
+        older_queries = QueryColumns()
+        older_events = []
+        checked = end
+        while end > floor and not truncated:
+            if checked - end >= TRUNCATE_CHECK_BYTES:
+                if os.fstat(fd).st_size < size:
+                    break
+                checked = end
+            start = mm.rfind(b'\n', 0, end - 1) + 1
+            parsed = self._parse_line(mm[start:end - 1])
+            if parsed:
+                if parsed['timestamp'] <= cutoff_time:
+                    break
+                if 'domain' in parsed:
+                    older_queries.append(parsed)
+                else:
+                    older_events.append(parsed)
+            end = start
+
+        # Restore file order so ties in the rankings resolve as before
+        older_queries.reverse()
+        older_events.reverse()
+        for block_queries, block_events in blocks:
+            self._queries.prepend(block_queries)
+            self._events = block_events + self._events
+        self._queries.prepend(older_queries)
+        self._events = older_events + self._events
+        self._head_offset = end
+        self._covered_from = cutoff_time
+
+    def _scan_blocks(self, mm, fd, size, end, floor, cutoff_time):
+        """Parse whole blocks between floor and end in worker processes
+
+        Each block is split at line boundaries across PARSE_WORKERS. Blocks
+        are kept, newest first, while every record in them is newer than
+        cutoff_time; the block that reaches the cutoff is left to the line
+        by line scan so it stops at the same line. Returns the kept blocks,
+        the offset they reach back to and whether the log shrank meanwhile.
+        """
+        blocks = []
+        if PARSE_WORKERS < 2 or end - floor <= PARALLEL_SCAN_BYTES:
+            return blocks, end, False
         try:
-            data = json.loads(line.strip())
-            if 'domain' in data:  # DNS query log
-                return {
-                    'timestamp': datetime.fromisoformat(data['timestamp'].replace('Z', '+00:00')),
-                    'domain': data['domain'],
-                    'client': data.get('client', 'unknown'),
-                    'resolver': data.get('resolver', 'unknown'),
-                    'response_time': float(data.get('response_time', 0)),
-                    'query_type': data.get('query_type', 'A'),
-                    'success': data.get('success', True)
-                }
-        except (json.JSONDecodeError, KeyError, ValueError):
+            with ProcessPoolExecutor(max_workers=PARSE_WORKERS) as pool:
+                while end - floor > PARALLEL_SCAN_BYTES:
+                    bounds = [end]
+                    step = PARALLEL_SCAN_BYTES // PARSE_WORKERS
+                    for _ in range(PARSE_WORKERS):
+                        bounds.append(mm.rfind(b'\n', 0, bounds[-1] - step) + 1)
+                    bounds.reverse()
+                    parts = list(pool.map(parse_log_range, repeat(self.log_file_path),
+                                          bounds[:-1], bounds[1:]))
+                    if os.fstat(fd).st_size < size:
+                        return blocks, end, True
+                    oldest = [min(queries.timestamps) for queries, _ in parts if len(queries)]
+                    oldest += [min(event['timestamp'] for event in events) for _, events in parts if events]
+                    if oldest and min(oldest) <= cutoff_time:
+                        break
+                    block_queries = QueryColumns()
+                    block_events = []
+                    for queries, events in reversed(parts):
+                        block_queries.prepend(queries)
+                        block_events = events + block_events
+                    blocks.append((block_queries, block_events))
+                    end = bounds[0]
+        except (OSError, BrokenProcessPool):
+            pass  # the line by line scan carries on from the last whole block
+        return blocks, end, False
+
+    def _parse_timestamp(self, value):
+        """Parse log timestamps by slicing out the numeric fields
+
+        Handles the asctime form ('2025-01-01 12:00:00,123') and the naive
+        isoformat() form written by the structured logger; anything else is
+        left to datetime.fromisoformat.
+        """
+        try:
+            if (value[4] == '-' and value[7] == '-' and value[10] in ' T' and
+                value[13] == ':' and value[16] == ':'):
+                fraction = value[20:26]
+                if len(value) == 19 or (value[19] in ',.' and fraction.isdigit() and len(value) <= 26):
+                    second = value[:19]
+                    if second == self._ts_cache_key:
+                        parsed = self._ts_cache_val
+                    else:
+                        parsed = datetime(
+                            int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                            int(value[11:13]), int(value[14:16]), int(value[17:19])
+                        )
+                        self._ts_cache_key = second
+                        self._ts_cache_val = parsed
+                    if fraction:
+                        return parsed.replace(microsecond=int(fraction.ljust(6, '0')))
+                    return parsed
+        except (IndexError, ValueError):
             pass
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+    def _parse_structured_log(self, line):
+        """Parse structured JSON log entries from a raw bytes line
+
+        Raises ValueError (or KeyError/TypeError/AttributeError) on malformed
+        entries; _parse_line catches them for the whole line.
+        """
+        data = json_loads(line)
+        if 'domain' in data:  # DNS query log
+            # Interned so repeated values share one object and dict
+            # lookups on them short-circuit on identity
+            domain = sys.intern(data['domain'])
+            resolver = sys.intern(data.get('resolver', 'unknown'))
+            return {
+                'timestamp': self._parse_timestamp(data['timestamp']),
+                'domain': domain,
+                'cdn': is_cdn_domain(domain.lower()),
+                'client': sys.intern(data.get('client', 'unknown')),
+                'resolver': resolver,
+                'resolver_code': RESOLVER_CODES.get(resolver, RESOLVER_OTHER),
+                'response_time': float(data.get('response_time', 0)),
+                'query_type': sys.intern(data.get('query_type', 'A')),
+                'success': data.get('success', True)
+            }
         return None
 
     def _parse_legacy_log(self, line):
-        """Parse legacy text-based log entries"""
-        # Enhanced regex patterns for different log types
-        patterns = [
-            # DNS_QUERY structured logs in text format
-            (r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+).*DNS_QUERY.*domain: (\S+).*client: (\S+).*resolver: (\S+).*response_time: ([\d.]+).*query_type: (\S+).*success: (\w+)', 'dns_query'),
-            # Fallback/failure events
-            (r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+).*Switching to fallback server: (\S+)', 'fallback_switch'),
-            (r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+).*Primary DNS.*is healthy again', 'primary_restored'),
-            (r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+).*Domain (\S+) bypassed.*repeated Unbound failures', 'domain_bypassed'),
-            # Health check failures
-            (r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d+).*DNS server (\S+) failed health check', 'health_failure'),
-        ]
-
-        for pattern, log_type in patterns:
-            match = re.search(pattern, line)
-            if match:
-                if log_type == 'dns_query':
-                    return {
-                        'timestamp': datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S,%f'),
-                        'domain': match.group(2),
-                        'client': match.group(3),
-                        'resolver': match.group(4),
-                        'response_time': float(match.group(5)),
-                        'query_type': match.group(6),
-                        'success': match.group(7).lower() == 'true'
-                    }
-                elif log_type in ['fallback_switch', 'primary_restored', 'domain_bypassed', 'health_failure']:
-                    return {
-                        'timestamp': datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S,%f'),
-                        'event_type': log_type,
-                        'details': match.group(2) if len(match.groups()) > 1 else None
-                    }
-        return None
+        """Parse legacy text-based log entries from a raw bytes line"""
+        match = LEGACY_LOG_PATTERN.match(line)
+        if not match:
+            return None
+        # The outer group of the matching alternative closes last
+        log_type = match.lastgroup
+        timestamp = self._parse_timestamp(match.group('ts').decode('ascii'))
+        if log_type == 'dns_query':
+            domain = sys.intern(match.group('domain').decode('utf-8', 'replace'))
+            resolver = sys.intern(match.group('resolver').decode('utf-8', 'replace'))
+            return {
+                'timestamp': timestamp,
+                'domain': domain,
+                'cdn': is_cdn_domain(domain.lower()),
+                'client': sys.intern(match.group('client').decode('utf-8', 'replace')),
+                'resolver': resolver,
+                'resolver_code': RESOLVER_CODES.get(resolver, RESOLVER_OTHER),
+                'response_time': float(match.group('response_time')),
+                'query_type': sys.intern(match.group('query_type').decode('utf-8', 'replace')),
+                'success': match.group('success').lower() == b'true'
+            }
+        details = LEGACY_EVENT_DETAILS[log_type]
+        return {
+            'timestamp': timestamp,
+            'event_type': log_type,
+            'details': match.group(details).decode('utf-8', 'replace') if details else None
+        }
 
     def get_analytics(self, hours=24):
         """Get comprehensive analytics from logs"""
-        with self.lock:
-            # Check cache validity
-            now = datetime.now()
-            if (self.cache_time and 
-                (now - self.cache_time).seconds < self.cache_duration and
-                'analytics' in self.cache):
-                return self.cache['analytics']
-
-            # Parse log file
-            cutoff_time = now - timedelta(hours=hours)
-            dns_queries = []
-            events = []
+        return self._get_cached(hours)[1]
 
-            try:
-                with open(self.log_file_path, 'r') as f:
-                    for line in f:
-                        # Try structured parsing first
-                        parsed = self._parse_structured_log(line)
-                        if not parsed:
-                            parsed = self._parse_legacy_log(line)
-                        
-                        if parsed and parsed.get('timestamp', now) > cutoff_time:
-                            if 'domain' in parsed:
-                                dns_queries.append(parsed)
-                            else:
-                                events.append(parsed)
+    def get_analytics_json(self, hours=24):
+        """Get the analytics as a serialized JSON body and its ETag, cached alongside the dict"""
+        return self._get_cached(hours)[2:]
 
-            except FileNotFoundError:
-                return self._empty_analytics()
+    def _get_cached(self, hours):
+        """Return the (time, analytics, json body, etag) cache entry for a window
 
-            # Generate analytics
-            analytics = self._generate_analytics(dns_queries, events, hours)
-            
-            # Cache results
-            self.cache['analytics'] = analytics
-            self.cache_time = now
-            
-            return analytics
+        Cache hits never take the lock. A stale entry keeps being served
+        while a background thread recomputes it; only a window with no entry
+        at all is computed in the calling thread.
+        """
+        entry = self.cache.get(hours)
+        if entry is None:
+            return self._refresh(hours)
+        if (datetime.now() - entry[0]).total_seconds() >= self.cache_duration:
+            self._start_refresh(hours)
+        return entry
+
+    def _start_refresh(self, hours):
+        """Recompute a window in the background unless that is already under way"""
+        with self._refresh_lock:
+            if hours in self._refreshing:
+                return
+            self._refreshing.add(hours)
+        threading.Thread(target=self._refresh, args=(hours,), name=f"AnalyticsRefresh-{hours}", daemon=True).start()
+
+    def _refresh(self, hours):
+        """Recompute the analytics for a window and publish its cache entry"""
+        try:
+            with self.lock:
+                now = datetime.now()
+                entry = self.cache.get(hours)
+                if entry and (now - entry[0]).total_seconds() < self.cache_duration:
+                    return entry  # refreshed while we waited for the lock
+
+                # Parse whatever was appended to the log since the last refresh
+                cutoff_time = now - timedelta(hours=hours)
+                try:
+                    self._refresh_records(cutoff_time)
+                except FileNotFoundError:
+                    self._reset_records()
+                    analytics = self._empty_analytics()
+                else:
+                    window_start = self._queries.window_start(cutoff_time)
+                    events = [e for e in self._events if e['timestamp'] > cutoff_time]
+
+                    # Generate analytics
+                    analytics = self._generate_analytics(self._queries, window_start, events, hours)
+
+                # Publish with a single assignment; readers see the old or the
+                # new entry, never a partial one. The body is serialized once
+                # for every poll served from this entry, and hashed so polls
+                # that already have it can be answered with a 304.
+                body = json.dumps(analytics, separators=(',', ':'), sort_keys=True).encode('utf-8')
+                etag = f'{hours}-{hashlib.sha1(body).hexdigest()[:16]}'
+                entry = self.cache[hours] = (now, analytics, body, etag)
+
+                # Drop windows nobody has asked for in a while
+                for cached_hours, cached in list(self.cache.items()):
+                    if (now - cached[0]).total_seconds() >= self.cache_expiry:
+                        del self.cache[cached_hours]
+                return entry
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(hours)
 
     def _empty_analytics(self):
         """Return empty analytics structure"""
@@ -157,158 +553,160 @@ class EnhancedLogAnalyzer:
             }
         }
 
-    def _generate_analytics(self, dns_queries, events, hours):
-        """Generate comprehensive analytics from parsed data"""
-        if not dns_queries:
+    def _generate_analytics(self, queries, start, events, hours):
+        """Generate comprehensive analytics from the queries from index start onwards"""
+        total_queries = len(queries) - start
+        if total_queries <= 0:
             return self._empty_analytics()
 
-        # Basic counts
-        total_queries = len(dns_queries)
-        unbound_queries = [q for q in dns_queries if q['resolver'] == 'unbound']
-        fallback_queries = [q for q in dns_queries if q['resolver'] == 'fallback']
-        bypassed_queries = [q for q in dns_queries if q['resolver'] == 'bypassed']
-        failed_queries = [q for q in dns_queries if not q['success']]
-
-        # CDN analysis
-        cdn_patterns = ['cloudfront.net', 'fastly.com', 'amazonaws.com', 'akamai.net', 'cloudflare.com']
-        cdn_queries = [q for q in dns_queries if any(pattern in q['domain'].lower() for pattern in cdn_patterns)]
-        cdn_unbound_success = [q for q in cdn_queries if q['resolver'] == 'unbound' and q['success']]
-
-        # Performance metrics
-        response_times = [q['response_time'] for q in dns_queries if q['response_time'] > 0]
-        response_times.sort()
-        
-        def percentile(data, p):
-            if not data:
-                return 0
-            k = (len(data) - 1) * p / 100
-            f = int(k)
-            c = k - f
-            if f + 1 < len(data):
-                return data[f] * (1 - c) + data[f + 1] * c
-            return data[f]
+        # Numeric reductions run over the packed columns with C-level
+        # builtins (array.count, sum, map/compress, Counter) so there is no
+        # Python-level loop per query for them
+        timestamps = queries.timestamps[start:]
+        codes = queries.resolver_codes[start:]
+        all_response_times = queries.response_times[start:]
+        successes = queries.successes[start:]
+        cdn = queries.cdn[start:]
+
+        unbound = bytes(map(RESOLVER_UNBOUND.__eq__, codes))
+        fallback = bytes(map(RESOLVER_FALLBACK.__eq__, codes))
+        bypassed = bytes(map(RESOLVER_BYPASSED.__eq__, codes))
+        unbound_success = bytes(map(operator.and_, unbound, successes))
+        failed = bytes(map(operator.not_, successes))
+
+        unbound_count = codes.count(RESOLVER_UNBOUND)
+        fallback_count = codes.count(RESOLVER_FALLBACK)
+        bypassed_count = codes.count(RESOLVER_BYPASSED)
+        failed_count = failed.count(1)
+        unbound_success_count = unbound_success.count(1)
+
+        total_response = sum(all_response_times)
+        unbound_response = sum(compress(all_response_times, unbound))
+        fallback_response = sum(compress(all_response_times, fallback))
+        response_times = sorted(filter((0.0).__lt__, all_response_times))
+        p50, p95, p99 = percentiles(response_times, (50, 95, 99))
+
+        cdn_count = cdn.count(1)
+        cdn_unbound_success = sum(compress(cdn, unbound_success))
+        cdn_bypassed = sum(compress(cdn, bypassed))
+
+        # Bucket i covers [now - (i+1)h, now - ih), like hour_start <= ts <
+        # hour_end; flooring from one microsecond before now keeps a query
+        # exactly at now - ih out of bucket i. Queries are counted per
+        # (hour, resolver code) under the key hour * 4 + code.
+        now = datetime.now()
+        bucket_edge = now - timedelta(microseconds=1)
+        hour_indexes = list(map(operator.floordiv, map(operator.sub, repeat(bucket_edge), timestamps), repeat(timedelta(hours=1))))
+        hourly_resolvers = Counter(map(operator.add, map(operator.mul, hour_indexes, repeat(4)), codes))
+        hourly_failed = Counter(compress(hour_indexes, failed))
+
+        client_stats = Counter(queries.clients[start:])
+        query_type_stats = Counter(queries.query_types[start:])
+        resolver_stats = Counter(queries.resolvers[start:])
+
+        # Domain analysis, one Counter per column over the masked domains
+        domains = queries.domains[start:]
+        domain_totals = Counter(domains)
+        domain_unbound_success = Counter(compress(domains, unbound_success))
+        domain_fallback = Counter(compress(domains, fallback))
+        domain_failed = Counter(compress(domains, failed))
 
         # Hourly statistics
         hourly_stats = []
-        now = datetime.now()
         for i in range(hours):
-            hour_start = now - timedelta(hours=i+1)
-            hour_end = now - timedelta(hours=i)
-            hour_queries = [q for q in dns_queries if hour_start <= q['timestamp'] < hour_end]
-            
+            unbound_hour = hourly_resolvers[i * 4 + RESOLVER_UNBOUND]
+            fallback_hour = hourly_resolvers[i * 4 + RESOLVER_FALLBACK]
+            bypassed_hour = hourly_resolvers[i * 4 + RESOLVER_BYPASSED]
             hourly_stats.append({
-                'hour': hour_start.strftime('%H:00'),
-                'total': len(hour_queries),
-                'unbound': len([q for q in hour_queries if q['resolver'] == 'unbound']),
-                'fallback': len([q for q in hour_queries if q['resolver'] == 'fallback']),
-                'bypassed': len([q for q in hour_queries if q['resolver'] == 'bypassed']),
-                'failed': len([q for q in hour_queries if not q['success']])
+                'hour': '%02d:00' % (now - timedelta(hours=i+1)).hour,
+                'total': unbound_hour + fallback_hour + bypassed_hour + hourly_resolvers[i * 4 + RESOLVER_OTHER],
+                'unbound': unbound_hour,
+                'fallback': fallback_hour,
+                'bypassed': bypassed_hour,
+                'failed': hourly_failed[i]
             })
 
-        # Domain analysis
-        domain_stats = defaultdict(lambda: {'total': 0, 'unbound_success': 0, 'fallback': 0, 'bypassed': 0, 'failed': 0})
-        client_stats = defaultdict(int)
-        query_type_stats = defaultdict(int)
-        resolver_stats = defaultdict(int)
-
-        for query in dns_queries:
-            domain = query['domain']
-            domain_stats[domain]['total'] += 1
-            
-            if query['resolver'] == 'unbound' and query['success']:
-                domain_stats[domain]['unbound_success'] += 1
-            elif query['resolver'] == 'fallback':
-                domain_stats[domain]['fallback'] += 1
-            elif query['resolver'] == 'bypassed':
-                domain_stats[domain]['bypassed'] += 1
-            
-            if not query['success']:
-                domain_stats[domain]['failed'] += 1
-            
-            client_stats[query['client']] += 1
-            query_type_stats[query['query_type']] += 1
-            resolver_stats[query['resolver']] += 1
-
         # Top domains and failing domains
-        top_domains = sorted(domain_stats.items(), key=lambda x: x[1]['total'], reverse=True)[:20]
-        top_failing_domains = sorted(
-            [(d, s) for d, s in domain_stats.items() if s['failed'] > 0 or s['fallback'] > s['unbound_success']], 
-            key=lambda x: x[1]['failed'] + x[1]['fallback'], 
-            reverse=True
-        )[:15]
+        top_domains = domain_totals.most_common(20)
+        top_failing_domains = heapq.nlargest(
+            15,
+            (d for d in domain_totals if domain_failed[d] > 0 or domain_fallback[d] > domain_unbound_success[d]),
+            key=lambda d: domain_failed[d] + domain_fallback[d]
+        )
 
         # Top clients
-        top_clients = sorted(client_stats.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_clients = client_stats.most_common(10)
 
         # Recent events
-        recent_events = sorted(events, key=lambda x: x['timestamp'], reverse=True)[:20]
+        recent_events = heapq.nlargest(20, events, key=lambda x: x['timestamp'])
 
         return {
             'summary': {
                 'total_queries': total_queries,
-                'unbound_queries': len(unbound_queries),
-                'fallback_queries': len(fallback_queries),
-                'bypassed_queries': len(bypassed_queries),
-                'failed_queries': len(failed_queries),
-                'unbound_success_rate': (len([q for q in unbound_queries if q['success']]) / max(1, len(unbound_queries))) * 100,
-                'fallback_usage_rate': (len(fallback_queries) / max(1, total_queries)) * 100,
-                'bypass_rate': (len(bypassed_queries) / max(1, total_queries)) * 100,
-                'average_response_time': sum(q['response_time'] for q in dns_queries) / max(1, total_queries),
-                'unbound_avg_response': sum(q['response_time'] for q in unbound_queries) / max(1, len(unbound_queries)),
-                'fallback_avg_response': sum(q['response_time'] for q in fallback_queries) / max(1, len(fallback_queries))
+                'unbound_queries': unbound_count,
+                'fallback_queries': fallback_count,
+                'bypassed_queries': bypassed_count,
+                'failed_queries': failed_count,
+                'unbound_success_rate': (unbound_success_count / max(1, unbound_count)) * 100,
+                'fallback_usage_rate': (fallback_count / max(1, total_queries)) * 100,
+                'bypass_rate': (bypassed_count / max(1, total_queries)) * 100,
+                'average_response_time': total_response / max(1, total_queries),
+                'unbound_avg_response': unbound_response / max(1, unbound_count),
+                'fallback_avg_response': fallback_response / max(1, fallback_count)
             },
             'hourly_stats': list(reversed(hourly_stats)),
-            'top_domains': [(domain, stats['total']) for domain, stats in top_domains],
-            'top_failing_domains': [(domain, {'failed': stats['failed'], 'fallback': stats['fallback'], 'total': stats['total']}) for domain, stats in top_failing_domains],
+            'top_domains': top_domains,
+            'top_failing_domains': [(domain, {'failed': domain_failed[domain], 'fallback': domain_fallback[domain], 'total': domain_totals[domain]}) for domain in top_failing_domains],
             'top_clients': top_clients,
             'resolver_distribution': dict(resolver_stats),
             'query_types': dict(query_type_stats),
-            'recent_events': [{'timestamp': e['timestamp'].strftime('%Y-%m-%d %H:%M:%S'), 'type': e.get('event_type', 'unknown'), 'details': e.get('details', '')} for e in recent_events],
+            'recent_events': [{'timestamp': e['timestamp'].isoformat(' ')[:19], 'type': e.get('event_type', 'unknown'), 'details': e.get('details', '')} for e in recent_events],
             'cdn_analysis': {
-                'total_cdn_queries': len(cdn_queries),
-                'cdn_unbound_success': len(cdn_unbound_success),
-                'cdn_bypass_rate': (len([q for q in cdn_queries if q['resolver'] == 'bypassed']) / max(1, len(cdn_queries))) * 100
+                'total_cdn_queries': cdn_count,
+                'cdn_unbound_success': cdn_unbound_success,
+                'cdn_bypass_rate': (cdn_bypassed / max(1, cdn_count)) * 100
             },
             'performance_metrics': {
-                'p50_response_time': percentile(response_times, 50),
-                'p95_response_time': percentile(response_times, 95),
-                'p99_response_time': percentile(response_times, 99)
+                'p50_response_time': p50,
+                'p95_response_time': p95,
+                'p99_response_time': p99
             }
         }
 
     def export_csv(self, hours=24):
-        """Export analytics data as CSV"""
+        """Export analytics data as CSV, yielding one encoded row at a time"""
         analytics = self.get_analytics(hours)
-        
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Write summary
-        writer.writerow(['=== SUMMARY ==='])
-        for key, value in analytics['summary'].items():
-            writer.writerow([key.replace('_', ' ').title(), f"{value:.2f}" if isinstance(value, float) else value])
-        
-        writer.writerow([])
-        writer.writerow(['=== TOP DOMAINS ==='])
-        writer.writerow(['Domain', 'Query Count'])
-        for domain, count in analytics['top_domains']:
-            writer.writerow([domain, count])
-            
-        writer.writerow([])
-        writer.writerow(['=== TOP FAILING DOMAINS ==='])
-        writer.writerow(['Domain', 'Failed Queries', 'Fallback Queries', 'Total Queries'])
-        for domain, stats in analytics['top_failing_domains']:
-            writer.writerow([domain, stats['failed'], stats['fallback'], stats['total']])
-            
-        writer.writerow([])
-        writer.writerow(['=== HOURLY STATISTICS ==='])
-        writer.writerow(['Hour', 'Total', 'Unbound', 'Fallback', 'Bypassed', 'Failed'])
-        for hour_stat in analytics['hourly_stats']:
-            writer.writerow([hour_stat['hour'], hour_stat['total'], hour_stat['unbound'], 
-                           hour_stat['fallback'], hour_stat['bypassed'], hour_stat['failed']])
-        
-        output.seek(0)
-        return output.getvalue()
+        line = CSVLine()
+        writer = csv.writer(line)
+
+        def rows():
+            # Write summary
+            yield ['=== SUMMARY ===']
+            for key, value in analytics['summary'].items():
+                yield [key.replace('_', ' ').title(), f"{value:.2f}" if isinstance(value, float) else value]
+
+            yield []
+            yield ['=== TOP DOMAINS ===']
+            yield ['Domain', 'Query Count']
+            for domain, count in analytics['top_domains']:
+                yield [domain, count]
+
+            yield []
+            yield ['=== TOP FAILING DOMAINS ===']
+            yield ['Domain', 'Failed Queries', 'Fallback Queries', 'Total Queries']
+            for domain, stats in analytics['top_failing_domains']:
+                yield [domain, stats['failed'], stats['fallback'], stats['total']]
+
+            yield []
+            yield ['=== HOURLY STATISTICS ===']
+            yield ['Hour', 'Total', 'Unbound', 'Fallback', 'Bypassed', 'Failed']
+            for hour_stat in analytics['hourly_stats']:
+                yield [hour_stat['hour'], hour_stat['total'], hour_stat['unbound'],
+                       hour_stat['fallback'], hour_stat['bypassed'], hour_stat['failed']]
+
+        for row in rows():
+            writer.writerow(row)
+            yield line.value.encode('utf-8')
 
 # Initialize log analyzer
 log_analyzer = EnhancedLogAnalyzer(LOG_FILE)
@@ -716,21 +1114,57 @@ DASHBOARD_HTML = """
         let charts = {};
         let isUpdating = false;
         let autoRefreshInterval = null;
+        let pendingFrame = null;
+        let refreshController = null;
+        let renderedEtag = null;
+        let nextRefreshAt = 0;
+        let refreshBackoff = 0;
+        const MIN_REFRESH_GAP = 5000;
+        const MAX_REFRESH_BACKOFF = 300000;
         
         // Initialize dashboard
         document.addEventListener('DOMContentLoaded', function() {
             refreshData(true);
             
-            // Auto-refresh every 30 seconds
-            autoRefreshInterval = setInterval(() => refreshData(false), 30000);
+            startAutoRefresh();
             
             // Time range change handler
             document.getElementById('timeRange').addEventListener('change', () => refreshData(true));
+            
+            // No polling while the tab is in the background; catch up on return
+            document.addEventListener('visibilitychange', () => {
+                if (document.hidden) {
+                    stopAutoRefresh();
+                } else {
+                    refreshData(false);
+                    startAutoRefresh();
+                }
+            });
         });
         
+        // Auto-refresh every 30 seconds
+        function startAutoRefresh() {
+            if (!autoRefreshInterval) {
+                autoRefreshInterval = setInterval(() => refreshData(false), 30000);
+            }
+        }
+        
+        function stopAutoRefresh() {
+            if (autoRefreshInterval) {
+                clearInterval(autoRefreshInterval);
+                autoRefreshInterval = null;
+            }
+        }
+        
         async function refreshData(showLoading = false) {
-            if (isUpdating) return;
+            if (showLoading) {
+                // A time range change supersedes a fetch still in flight
+                if (refreshController) refreshController.abort();
+            } else if (isUpdating || Date.now() < nextRefreshAt) {
+                return;
+            }
             isUpdating = true;
+            const controller = refreshController = new AbortController();
             
             const timeRange = document.getElementById('timeRange').value;
             
@@ -743,28 +1177,45 @@ DASHBOARD_HTML = """
             }
             
             try {
-                const response = await fetch(`/api/analytics?hours=${timeRange}`);
+                const response = await fetch(`/api/analytics?hours=${timeRange}`, { signal: controller.signal });
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                // Unchanged analytics (revalidated with a 304) need no parsing,
+                // chart data or redraw at all
+                const etag = response.headers.get('ETag');
+                if (!showLoading && etag && etag === renderedEtag) return;
                 const newData = await response.json();
+                renderedEtag = etag;
                 
-                previousData = currentData;
+                // previousData stays the last rendered data while a frame is pending
+                if (pendingFrame === null) previousData = currentData;
                 currentData = newData;
                 
                 if (showLoading || !previousData) {
                     // Initial load or time range change
+                    cancelAnimationFrame(pendingFrame);
+                    pendingFrame = null;
                     updateDashboard(true);
                     document.getElementById('loading').style.display = 'none';
                     document.getElementById('dashboard').style.display = 'block';
                 } else {
                     // Seamless update
-                    updateDashboard(false);
+                    scheduleUpdate();
                 }
+                refreshBackoff = 0;
             } catch (error) {
+                if (error.name === 'AbortError') return;
+                // Back off while the server is failing instead of polling at full rate
+                refreshBackoff = Math.min(Math.max(refreshBackoff * 2, 30000), MAX_REFRESH_BACKOFF);
                 console.error('Error fetching data:', error);
                 if (showLoading) {
                     document.getElementById('loading').innerHTML = '❌ Error loading data';
                 }
             } finally {
-                isUpdating = false;
+                if (controller === refreshController) {
+                    isUpdating = false;
+                    refreshController = null;
+                    nextRefreshAt = Date.now() + Math.max(MIN_REFRESH_GAP, refreshBackoff);
+                }
                 // Hide update indicator
                 setTimeout(() => {
                     document.getElementById('updateIndicator').classList.remove('show');
@@ -778,12 +1229,47 @@ DASHBOARD_HTML = """
             updateTables(fullUpdate);
         }
         
+        // Apply seamless updates at most once per frame, with the newest data;
+        // frames are not run while the tab is hidden
+        function scheduleUpdate() {
+            if (pendingFrame !== null) return;
+            pendingFrame = requestAnimationFrame(() => {
+                pendingFrame = null;
+                updateDashboard(false);
+            });
+        }
+        
+        // One shared formatter; toLocaleString() builds a new one per call
+        const numberFormat = new Intl.NumberFormat();
+        const formatNumber = value => numberFormat.format(value);
+        
+        // Table percentages mostly repeat from one refresh to the next
+        const percentCache = new Map();
+        function formatPercent(part, total) {
+            const key = `${part}/${total}`;
+            let text = percentCache.get(key);
+            if (text === undefined) {
+                text = ((part / total) * 100).toFixed(1) + '%';
+                if (percentCache.size >= 1024) percentCache.clear();
+                percentCache.set(key, text);
+            }
+            return text;
+        }
+        
+        // Running value animations, stepped together from one frame callback
+        // so every animated element is written in the same pass
+        const animations = new Map();
+        let animationFrame = null;
+        
         function animateValue(element, start, end, duration) {
-            const range = end - start;
-            const startTime = performance.now();
-            
-            function update(currentTime) {
-                const elapsed = currentTime - startTime;
+            animations.set(element, { start, range: end - start, startTime: performance.now(), duration });
+            if (animationFrame === null) animationFrame = requestAnimationFrame(stepAnimations);
+        }
+        
+        function stepAnimations(currentTime) {
+            animationFrame = null;
+            animations.forEach(({ start, range, startTime, duration }, element) => {
+                const elapsed = Math.max(currentTime - startTime, 0);
                 const progress = Math.min(elapsed / duration, 1);
                 const current = start + (range * progress);
                 
@@ -792,15 +1278,12 @@ DASHBOARD_HTML = """
                 } else if (element.dataset.isTime === 'true') {
                     element.textContent = current.toFixed(0) + 'ms';
                 } else {
-                    element.textContent = Math.round(current).toLocaleString();
+                    element.textContent = formatNumber(Math.round(current));
                 }
                 
-                if (progress < 1) {
-                    requestAnimationFrame(update);
-                }
-            }
-            
-            requestAnimationFrame(update);
+                if (progress >= 1) animations.delete(element);
+            });
+            if (animations.size) animationFrame = requestAnimationFrame(stepAnimations);
         }
         
         function updateSummaryStats(fullUpdate = true) {
@@ -826,17 +1309,23 @@ DASHBOARD_HTML = """
                              data-is-time="${stat.isTime || false}">
                             ${stat.isPercentage ? stat.value.toFixed(1) + '%' : 
                               stat.isTime ? stat.value.toFixed(0) + 'ms' :
-                              stat.value.toLocaleString()}
+                              formatNumber(stat.value)}
                         </div>
                         <div class="stat-label">${stat.label}</div>
                     </div>
                 `).join('');
             } else {
-                // Animate value changes
-                statsConfig.forEach((stat, index) => {
+                // Read every old value first, then write, so DOM reads and
+                // writes are not interleaved card by card
+                const cards = statsConfig.map((stat, index) => {
                     const card = document.getElementById(`stat-${index}`);
                     const valueElement = card.querySelector('.stat-value');
-                    const oldValue = parseFloat(valueElement.dataset.value) || 0;
+                    return { card, valueElement, oldValue: parseFloat(valueElement.dataset.value) || 0 };
+                });
+                
+                // Animate value changes
+                statsConfig.forEach((stat, index) => {
+                    const { card, valueElement, oldValue } = cards[index];
                     
                     if (Math.abs(oldValue - stat.value) > 0.01) {
                         card.classList.add('updating');
@@ -865,6 +1354,24 @@ DASHBOARD_HTML = """
             updateQueryTypeChart(fullUpdate);
         }
         
+        // Chart palettes, shared by every update rather than rebuilt per call
+        const RESOLVER_COLORS = Object.freeze(['#10b981', '#f59e0b', '#ef4444', '#3b82f6', '#8b5cf6']);
+        const PERFORMANCE_COLORS = Object.freeze(['#10b981', '#f59e0b', '#ef4444']);
+        const QUERY_TYPE_COLORS = Object.freeze(['#3b82f6', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#06b6d4']);
+        
+        // Copy new labels and values into the chart's existing arrays, so
+        // Chart.js keeps its dataset metadata instead of rebinding new
+        // data objects, and redraw without animation
+        function patchChart(chart, chartData) {
+            const data = chart.data;
+            data.labels.splice(0, data.labels.length, ...chartData.labels);
+            chartData.datasets.forEach((dataset, i) => {
+                const values = data.datasets[i].data;
+                values.splice(0, values.length, ...dataset.data);
+            });
+            chart.update('none');
+        }
+        
         function updateHourlyChart(fullUpdate) {
             const container = document.getElementById('hourlyChartContainer');
             const ctx = document.getElementById('hourlyChart').getContext('2d');
@@ -910,7 +1417,7 @@ DASHBOARD_HTML = """
                     options: {
                         responsive: true,
                         animation: {
-                            duration: fullUpdate ? 1000 : 0
+                            duration: fullUpdate && !document.hidden ? 1000 : 0
                         },
                         plugins: {
                             legend: {
@@ -926,8 +1433,7 @@ DASHBOARD_HTML = """
                 });
             } else {
                 container.classList.add('updating');
-                charts.hourly.data = chartData;
-                charts.hourly.update('none');
+                patchChart(charts.hourly, chartData);
                 setTimeout(() => container.classList.remove('updating'), 300);
             }
         }
@@ -941,13 +1447,7 @@ DASHBOARD_HTML = """
                 labels: Object.keys(resolverData),
                 datasets: [{
                     data: Object.values(resolverData),
-                    backgroundColor: [
-                        '#10b981',
-                        '#f59e0b',
-                        '#ef4444',
-                        '#3b82f6',
-                        '#8b5cf6'
-                    ]
+                    backgroundColor: RESOLVER_COLORS
                 }]
             };
             
@@ -958,7 +1458,7 @@ DASHBOARD_HTML = """
                     options: {
                         responsive: true,
                         animation: {
-                            duration: fullUpdate ? 1000 : 0
+                            duration: fullUpdate && !document.hidden ? 1000 : 0
                         },
                         plugins: {
                             legend: {
@@ -969,8 +1469,7 @@ DASHBOARD_HTML = """
                 });
             } else {
                 container.classList.add('updating');
-                charts.resolver.data = chartData;
-                charts.resolver.update('none');
+                patchChart(charts.resolver, chartData);
                 setTimeout(() => container.classList.remove('updating'), 300);
             }
         }
@@ -989,11 +1488,7 @@ DASHBOARD_HTML = """
                         perfMetrics.p95_response_time * 1000,
                         perfMetrics.p99_response_time * 1000
                     ],
-                    backgroundColor: [
-                        '#10b981',
-                        '#f59e0b',
-                        '#ef4444'
-                    ]
+                    backgroundColor: PERFORMANCE_COLORS
                 }]
             };
             
@@ -1004,7 +1499,7 @@ DASHBOARD_HTML = """
                     options: {
                         responsive: true,
                         animation: {
-                            duration: fullUpdate ? 1000 : 0
+                            duration: fullUpdate && !document.hidden ? 1000 : 0
                         },
                         plugins: {
                             legend: {
@@ -1024,8 +1519,7 @@ DASHBOARD_HTML = """
                 });
             } else {
                 container.classList.add('updating');
-                charts.performance.data = chartData;
-                charts.performance.update('none');
+                patchChart(charts.performance, chartData);
                 setTimeout(() => container.classList.remove('updating'), 300);
             }
         }
@@ -1039,14 +1533,7 @@ DASHBOARD_HTML = """
                 labels: Object.keys(queryTypeData),
                 datasets: [{
                     data: Object.values(queryTypeData),
-                    backgroundColor: [
-                        '#3b82f6',
-                        '#10b981',
-                        '#f59e0b',
-                        '#ef4444',
-                        '#8b5cf6',
-                        '#06b6d4'
-                    ]
+                    backgroundColor: QUERY_TYPE_COLORS
                 }]
             };
             
@@ -1057,7 +1544,7 @@ DASHBOARD_HTML = """
                     options: {
                         responsive: true,
                         animation: {
-                            duration: fullUpdate ? 1000 : 0
+                            duration: fullUpdate && !document.hidden ? 1000 : 0
                         },
                         plugins: {
                             legend: {
@@ -1068,8 +1555,7 @@ DASHBOARD_HTML = """
                 });
             } else {
                 container.classList.add('updating');
-                charts.queryType.data = chartData;
-                charts.queryType.update('none');
+                patchChart(charts.queryType, chartData);
                 setTimeout(() => container.classList.remove('updating'), 300);
             }
         }
@@ -1081,30 +1567,68 @@ DASHBOARD_HTML = """
             updateRecentEventsTable(fullUpdate);
         }
         
+        // Reconcile a table with rows given as {key, className, cells}, where
+        // each cell is [content, className, isHtml]. Rows are kept by key
+        // between updates and only cells whose content or class changed are
+        // written, instead of re-serializing the whole table.
+        function renderTable(table, headers, rows) {
+            if (!table.tBodies.length) {
+                table.innerHTML = `
+                    <thead>
+                        <tr>${headers.map(header => `<th>${header}</th>`).join('')}</tr>
+                    </thead>
+                    <tbody></tbody>
+                `;
+                table.rowMap = new Map();
+            }
+            const tbody = table.tBodies[0];
+            const rowMap = table.rowMap;
+            const seen = new Map();
+            
+            rows.forEach((row, index) => {
+                let key = row.key;
+                while (seen.has(key)) key += '\\u0000';
+                let tr = rowMap.get(key);
+                if (!tr) {
+                    tr = document.createElement('tr');
+                    row.cells.forEach(() => tr.appendChild(document.createElement('td')));
+                }
+                if (tr.className !== row.className) tr.className = row.className;
+                row.cells.forEach(([content, className = '', isHtml = false], i) => {
+                    const td = tr.cells[i];
+                    if (td.content !== content) {
+                        if (isHtml) td.innerHTML = content;
+                        else td.textContent = content;
+                        td.content = content;
+                    }
+                    if (td.className !== className) td.className = className;
+                });
+                if (tbody.rows[index] !== tr) tbody.insertBefore(tr, tbody.rows[index] || null);
+                seen.set(key, tr);
+            });
+            
+            rowMap.forEach((tr, key) => {
+                if (!seen.has(key)) tr.remove();
+            });
+            table.rowMap = seen;
+        }
+        
         function updateTopDomainsTable(fullUpdate) {
             const container = document.getElementById('topDomainsContainer');
             const table = document.getElementById('topDomainsTable');
             
             if (!fullUpdate) container.classList.add('updating');
             
-            table.innerHTML = `
-                <thead>
-                    <tr>
-                        <th>Domain</th>
-                        <th>Queries</th>
-                        <th>Percentage</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${currentData.top_domains.slice(0, 15).map(([domain, count]) => `
-                        <tr>
-                            <td>${domain}</td>
-                            <td>${count.toLocaleString()}</td>
-                            <td>${((count / currentData.summary.total_queries) * 100).toFixed(1)}%</td>
-                        </tr>
-                    `).join('')}
-                </tbody>
-            `;
+            renderTable(table, ['Domain', 'Queries', 'Percentage'],
+                currentData.top_domains.slice(0, 15).map(([domain, count]) => ({
+                    key: domain,
+                    className: '',
+                    cells: [
+                        [domain],
+                        [formatNumber(count)],
+                        [formatPercent(count, currentData.summary.total_queries)]
+                    ]
+                })));
             
             if (!fullUpdate) {
                 setTimeout(() => container.classList.remove('updating'), 300);
@@ -1117,29 +1641,20 @@ DASHBOARD_HTML = """
             
             if (!fullUpdate) container.classList.add('updating');
             
-            table.innerHTML = `
-                <thead>
-                    <tr>
-                        <th>Domain</th>
-                        <th>Failed</th>
-                        <th>Fallback</th>
-                        <th>Success Rate</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${currentData.top_failing_domains.slice(0, 15).map(([domain, stats]) => {
-                        const successRate = ((stats.total - stats.failed - stats.fallback) / stats.total * 100).toFixed(1);
-                        return `
-                            <tr>
-                                <td>${domain}</td>
-                                <td class="danger">${stats.failed}</td>
-                                <td class="warning">${stats.fallback}</td>
-                                <td class="${successRate > 50 ? 'success' : 'danger'}">${successRate}%</td>
-                            </tr>
-                        `;
-                    }).join('')}
-                </tbody>
-            `;
+            renderTable(table, ['Domain', 'Failed', 'Fallback', 'Success Rate'],
+                currentData.top_failing_domains.slice(0, 15).map(([domain, stats]) => {
+                    const successRate = ((stats.total - stats.failed - stats.fallback) / stats.total * 100).toFixed(1);
+                    return {
+                        key: domain,
+                        className: '',
+                        cells: [
+                            [domain],
+                            [String(stats.failed), 'danger'],
+                            [String(stats.fallback), 'warning'],
+                            [successRate + '%', successRate > 50 ? 'success' : 'danger']
+                        ]
+                    };
+                }));
             
             if (!fullUpdate) {
                 setTimeout(() => container.classList.remove('updating'), 300);
@@ -1152,24 +1667,16 @@ DASHBOARD_HTML = """
             
             if (!fullUpdate) container.classList.add('updating');
             
-            table.innerHTML = `
-                <thead>
-                    <tr>
-                        <th>Client IP</th>
-                        <th>Queries</th>
-                        <th>Percentage</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${currentData.top_clients.slice(0, 10).map(([client, count]) => `
-                        <tr>
-                            <td>${client}</td>
-                            <td>${count.toLocaleString()}</td>
-                            <td>${((count / currentData.summary.total_queries) * 100).toFixed(1)}%</td>
-                        </tr>
-                    `).join('')}
-                </tbody>
-            `;
+            renderTable(table, ['Client IP', 'Queries', 'Percentage'],
+                currentData.top_clients.slice(0, 10).map(([client, count]) => ({
+                    key: client,
+                    className: '',
+                    cells: [
+                        [client],
+                        [formatNumber(count)],
+                        [formatPercent(count, currentData.summary.total_queries)]
+                    ]
+                })));
             
             if (!fullUpdate) {
                 setTimeout(() => container.classList.remove('updating'), 300);
@@ -1183,93 +1690,92 @@ DASHBOARD_HTML = """
             if (!fullUpdate) container.classList.add('updating');
             
             // Check for new events
-            const previousEvents = previousData ? previousData.recent_events : [];
-            const newEventTimestamps = currentData.recent_events
-                .filter(e => !previousEvents.some(pe => pe.timestamp === e.timestamp))
-                .map(e => e.timestamp);
+            const previousTimestamps = new Set((previousData ? previousData.recent_events : []).map(e => e.timestamp));
+            const newEventTimestamps = new Set(currentData.recent_events
+                .filter(e => !previousTimestamps.has(e.timestamp))
+                .map(e => e.timestamp));
             
-            table.innerHTML = `
-                <thead>
-                    <tr>
-                        <th>Time</th>
-                        <th>Event</th>
-                        <th>Details</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    ${currentData.recent_events.slice(0, 20).map(event => {
-                        const eventClass = event.type.includes('fail') ? 'danger' : 
-                                         event.type.includes('bypass') ? 'warning' : 'info';
-                        const isNew = newEventTimestamps.includes(event.timestamp);
-                        return `
-                            <tr class="${isNew && !fullUpdate ? 'new-row' : ''}">
-                                <td>${event.timestamp}</td>
-                                <td><span class="status-indicator status-${eventClass === 'danger' ? 'error' : eventClass === 'warning' ? 'warning' : 'healthy'}"></span>${event.type}</td>
-                                <td>${event.details || '-'}</td>
-                            </tr>
-                        `;
-                    }).join('')}
-                </tbody>
-            `;
+            renderTable(table, ['Time', 'Event', 'Details'],
+                currentData.recent_events.slice(0, 20).map(event => {
+                    const eventClass = event.type.includes('fail') ? 'danger' : 
+                                     event.type.includes('bypass') ? 'warning' : 'info';
+                    const status = eventClass === 'danger' ? 'error' : eventClass === 'warning' ? 'warning' : 'healthy';
+                    const isNew = newEventTimestamps.has(event.timestamp);
+                    return {
+                        key: `${event.timestamp} ${event.type} ${event.details}`,
+                        className: isNew && !fullUpdate ? 'new-row' : '',
+                        cells: [
+                            [event.timestamp],
+                            [`<span class="status-indicator status-${status}"></span>${event.type}`, '', true],
+                            [event.details || '-']
+                        ]
+                    };
+                }));
             
             if (!fullUpdate) {
                 setTimeout(() => container.classList.remove('updating'), 300);
             }
         }
         
-        async function exportCSV() {
+        function exportCSV() {
+            // Let the browser download the streamed response straight to disk
+            // rather than buffering it into a Blob first
             const timeRange = document.getElementById('timeRange').value;
-            try {
-                const response = await fetch(`/api/export?hours=${timeRange}`);
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
-                const a = document.createElement('a');
-                a.href = url;
-                a.download = `dns-fallback-analytics-${new Date().toISOString().split('T')[0]}.csv`;
-                document.body.appendChild(a);
-                a.click();
-                document.body.removeChild(a);
-                window.URL.revokeObjectURL(url);
-            } catch (error) {
-                console.error('Error exporting CSV:', error);
-                alert('Error exporting CSV data');
-            }
+            const a = document.createElement('a');
+            a.href = `/api/export?hours=${timeRange}`;
+            a.download = `dns-fallback-analytics-${new Date().toISOString().split('T')[0]}.csv`;
+            document.body.appendChild(a);
+            a.click();
+            document.body.removeChild(a);
         }
         
         // Clean up interval on page unload
-        window.addEventListener('beforeunload', () => {
-            if (autoRefreshInterval) {
-                clearInterval(autoRefreshInterval);
-            }
-        });
+        window.addEventListener('beforeunload', stopAutoRefresh);
     </script>
 </body>
 </html>
 """
+# The page has no template variables, so it is encoded and compressed once
+# and served as is, in the client's preferred encoding
+DASHBOARD_PAGE = DASHBOARD_HTML.encode('utf-8')
+DASHBOARD_ETAG = hashlib.sha1(DASHBOARD_PAGE).hexdigest()[:16]
+DASHBOARD_ENCODINGS = [('gzip', gzip.compress(DASHBOARD_PAGE, compresslevel=9))]
+if brotli:
+    DASHBOARD_ENCODINGS.insert(0, ('br', brotli.compress(DASHBOARD_PAGE, quality=11)))
 
 @app.route('/')
 def dashboard():
-    return render_template_string(DASHBOARD_HTML)
+    for encoding, body in DASHBOARD_ENCODINGS:
+        if request.accept_encodings[encoding]:
+            break
+    else:
+        encoding, body = 'identity', DASHBOARD_PAGE
+    response = Response(body, mimetype='text/html')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.max_age = 60
+    response.set_etag(f'{DASHBOARD_ETAG}-{encoding}')
+    return response.make_conditional(request)
 
 @app.route('/api/analytics')
 def api_analytics():
     hours = int(request.args.get('hours', 24))
-    analytics = log_analyzer.get_analytics(hours)
-    return jsonify(analytics)
+    body, etag = log_analyzer.get_analytics_json(hours)
+    response = Response(body, mimetype='application/json')
+    response.cache_control.no_cache = True
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 @app.route('/api/export')
 def api_export():
     hours = int(request.args.get('hours', 24))
-    csv_data = log_analyzer.export_csv(hours)
-    
-    output = io.StringIO(csv_data)
-    output.seek(0)
-    
-    return send_file(
-        io.BytesIO(output.getvalue().encode('utf-8')),
+    filename = f'dns-fallback-analytics-{datetime.now().strftime("%Y%m%d")}.csv'
+    return Response(
+        log_analyzer.export_csv(hours),
         mimetype='text/csv',
-        as_attachment=True,
-        download_name=f'dns-fallback-analytics-{datetime.now().strftime("%Y%m%d")}.csv'
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
 @app.route('/health')
@@ -1302,9 +1808,14 @@ if __name__ == '__main__':
     print(f"📊 Monitoring log file: {LOG_FILE}")
     print(f"🔍 Health check: http://{DASHBOARD_HOST}:{DASHBOARD_PORT}/health")
     
-    app.run(
-        host=DASHBOARD_HOST,
-        port=DASHBOARD_PORT,
-        debug=False,
-        threaded=True
-    )
+    # A single process with threads: all requests share one analyzer, so the
+    # log is parsed once rather than once per worker process
+    if serve:
+        serve(app, host=DASHBOARD_HOST, port=DASHBOARD_PORT, threads=DASHBOARD_THREADS)
+    else:
+        app.run(
+            host=DASHBOARD_HOST,
+            port=DASHBOARD_PORT,
+            debug=False,
+            threaded=True
+        )
@@ -110,41 +110,55 @@ import logging.handlers
 import configparser
 import threading
 import random
-import json
 import signal
+import atexit
+import queue
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Tuple, List, Dict, Set
-from datetime import datetime, timedelta
-from collections import defaultdict, deque
+from typing import Optional, Tuple, List, Dict, Set, NamedTuple
+from datetime import datetime
+from collections import OrderedDict, deque
+from itertools import chain
 import fcntl
 import os
 import sys
 import hashlib
+import re
+import heapq
+import operator
 
-from dnslib import DNSRecord, DNSHeader, QTYPE, RCODE, DNSError
+from dnslib import DNSRecord, QTYPE, RCODE, DNSError
+try:
+    # orjson serializes structured log records several times faster when installed
+    from orjson import dumps as _orjson_dumps
+
+    def json_dumps(obj) -> str:
+        return _orjson_dumps(obj).decode('utf-8')
+except ImportError:
+    from json import dumps as json_dumps
 
 CONFIG_FILE_PATH = Path("/opt/dns-fallback/config.ini")
 DNS_STANDARD_PORT = 53
 
 @dataclass
 class DomainStats:
+    # Times are time.monotonic() seconds; cheaper than datetime on every query
     unbound_failures: int = 0
     total_queries: int = 0
-    last_unbound_success: Optional[datetime] = None
-    last_failure: Optional[datetime] = None
+    last_unbound_success: Optional[float] = None
+    last_failure: Optional[float] = None
     consecutive_failures: int = 0
-    bypass_until: Optional[datetime] = None
+    bypass_until: Optional[float] = None
 
-@dataclass
-class QueryMetrics:
+class QueryMetrics(NamedTuple):
+    # A plain tuple: ten thousand of these are kept in metrics_log
     domain: str
     client_ip: str
     resolver: str  # 'unbound', 'fallback', 'bypassed'
     response_time: float
     query_type: str
-    timestamp: datetime
+    timestamp: float  # time.time()
     success: bool
 
 @dataclass
@@ -167,6 +181,7 @@ class Config:
     fallback_threshold: int = 3
     bypass_duration: int = 3600  # seconds
     enable_query_deduplication: bool = True
+    response_cache_size: int = 1000  # 0 disables the TTL response cache
     structured_logging: bool = True
 
 # CDN and known problematic patterns
@@ -174,16 +189,118 @@ CDN_PATTERNS = {
     'cloudfront.net', 'fastly.com', 'amazonaws.com', 'akamai.net',
     'cloudflare.com', 'jsdelivr.net', 'unpkg.com', 'cdnjs.cloudflare.com'
 }
+# All patterns in one case-insensitive scan instead of one substring test each
+CDN_PATTERN_RE = re.compile('|'.join(re.escape(p) for p in sorted(CDN_PATTERNS)), re.IGNORECASE)
+# Label bytes dnslib prints as \DDD escapes
+NON_PRINTABLE_RE = re.compile(rb'[^!-~]')
+
+def parse_question(data: bytes) -> Tuple[str, int, int]:
+    """Read the first question of a DNS query straight from the wire
+
+    Returns (domain without the trailing dot, qtype, offset just past the
+    question); the domain is spelled the way dnslib prints names. Raises
+    DNSError for anything that is not a well-formed query.
+    """
+    end = len(data)
+    if end < 17 or data[2] & 0x80 or not (data[4] or data[5]):
+        raise DNSError("Not a DNS query")
+    labels = []
+    offset = 12
+    while True:
+        if offset >= end:
+            raise DNSError("Truncated question")
+        length = data[offset]
+        if not length:
+            break
+        if length > 63:
+            # Compression pointers have nothing to point at in a query's first name
+            raise DNSError("Invalid label in question")
+        label = data[offset + 1:offset + 1 + length]
+        offset += 1 + length
+        if NON_PRINTABLE_RE.search(label):
+            labels.append(''.join(chr(c) if 32 < c < 127 else '\\%03d' % c for c in label))
+        else:
+            labels.append(label.decode('ascii'))
+    if offset + 5 > end:
+        raise DNSError("Truncated question")
+    qtype = (data[offset + 1] << 8) | data[offset + 2]
+    return '.'.join(labels).rstrip('.'), qtype, offset + 5
+
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that batches writes instead of flushing every record
+
+    Records collect in a 64KB buffer that a background thread flushes every
+    flush_interval seconds; WARNING and above, rollover and close flush at
+    once. The file size for rollover is tracked here because the stock check
+    seeks the stream, which would flush on every record.
+    """
+
+    def __init__(self, filename, flush_interval: float = 1.0, buffer_size: int = 64 * 1024, **kwargs):
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._size = 0
+        super().__init__(filename, **kwargs)
+        self._stop_flushing = threading.Event()
+        threading.Thread(target=self._flush_loop, name="LogFlusher", daemon=True).start()
+
+    def _open(self):
+        kwargs = {}
+        errors = getattr(self, 'errors', None)  # FileHandler has it from Python 3.9
+        if errors is not None:
+            kwargs['errors'] = errors
+        stream = open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                      encoding=self.encoding, **kwargs)
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def _flush_loop(self):
+        while not self._stop_flushing.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self.stream:
+                self.stream.flush()
+                # Resync after external truncation (logrotate copytruncate)
+                self._size = os.fstat(self.stream.fileno()).st_size
+        finally:
+            self.release()
+
+    def emit(self, record):
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            # maxBytes counts encoded bytes; ASCII records are one byte per character
+            size = len(msg) if msg.isascii() else len(msg.encode(self.encoding or 'utf-8', 'replace'))
+            if self.maxBytes > 0 and self._size and self._size + size >= self.maxBytes:
+                self.doRollover()
+            self.stream.write(msg)
+            self._size += size
+            if record.levelno >= logging.WARNING:
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self._stop_flushing.set()
+        super().close()
 
 def setup_logging(log_file: Path, structured: bool = True) -> logging.Logger:
     log_dir = log_file.parent
     log_dir.mkdir(parents=True, exist_ok=True)
     logger = logging.getLogger(__name__)
+    if logger.handlers:
+        # Already configured; a second handler/listener would duplicate every line
+        return logger
     logger.setLevel(logging.INFO)
     
     # Create handler with larger rotation
-    handler = logging.handlers.RotatingFileHandler(
-        log_file, maxBytes=50 * 1024 * 1024, backupCount=10
+    handler = BufferedRotatingFileHandler(
+        log_file, maxBytes=50 * 1024 * 1024, backupCount=10, encoding='utf-8'
     )
     
     if structured:
@@ -207,14 +324,21 @@ def setup_logging(log_file: Path, structured: bool = True) -> logging.Logger:
                     log_entry['response_time'] = record.response_time
                 if hasattr(record, 'query_type'):
                     log_entry['query_type'] = record.query_type
-                return json.dumps(log_entry)
+                return json_dumps(log_entry)
         
         handler.setFormatter(JSONFormatter())
     else:
         formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(threadName)s - %(message)s')
         handler.setFormatter(formatter)
     
-    logger.addHandler(handler)
+    # Query threads only enqueue records; formatting and file writes happen
+    # on the listener thread so rotation never stalls a DNS response
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
     return logger
 
 def load_configuration(config_path: Path) -> Config:
@@ -248,6 +372,7 @@ def load_configuration(config_path: Path) -> Config:
             fallback_threshold=proxy_config.getint('fallback_threshold', 3),
             bypass_duration=proxy_config.getint('bypass_duration', 3600),
             enable_query_deduplication=proxy_config.getboolean('enable_query_deduplication', True),
+            response_cache_size=proxy_config.getint('response_cache_size', 1000),
             structured_logging=proxy_config.getboolean('structured_logging', True)
         )
     except (configparser.Error, KeyError, ValueError) as e:
@@ -289,11 +414,17 @@ class EnhancedDNSProxy:
         self.tcp_sock: Optional[socket.socket] = None
         
         # Enhanced features
-        self.domain_stats: Dict[str, DomainStats] = {}
-        self.query_cache: Dict[str, deque] = defaultdict(lambda: deque(maxlen=100))  # Recent queries per domain
-        self.pending_queries: Dict[str, threading.Event] = {}  # Query deduplication
-        self.query_results: Dict[str, Optional[bytes]] = {}  # Cached results for deduplication
+        self.domain_stats: 'OrderedDict[str, DomainStats]' = OrderedDict()  # LRU order, oldest first
+        # Query deduplication: key -> (done event, [shared response]) for queries in flight
+        self.pending_queries: Dict[str, Tuple[threading.Event, list]] = {}
+        self._pending_lock = threading.Lock()
         self.metrics_log: deque = deque(maxlen=10000)  # Recent metrics
+        # Upstream answers keyed by the query minus its ID: (expires, stored, response), LRU order
+        self.response_cache: 'OrderedDict[bytes, Tuple[float, float, bytes]]' = OrderedDict()
+        # Idle upstream UDP sockets, reused across queries instead of one socket per query
+        self._udp_pool: Dict[str, queue.LifoQueue] = {
+            server: queue.LifoQueue(maxsize=self.config.max_workers) for server in self.dns_server_list
+        }
         
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -324,8 +455,7 @@ class EnhancedDNSProxy:
 
     def _is_cdn_domain(self, domain: str) -> bool:
         """Check if domain matches known CDN patterns"""
-        domain_lower = domain.lower().rstrip('.')
-        return any(pattern in domain_lower for pattern in CDN_PATTERNS)
+        return CDN_PATTERN_RE.search(domain) is not None
 
     def _should_bypass_unbound(self, domain: str) -> bool:
         """Check if domain should bypass Unbound based on learned patterns"""
@@ -337,11 +467,11 @@ class EnhancedDNSProxy:
             return True
             
         # Check domain stats
-        if domain in self.domain_stats:
-            stats = self.domain_stats[domain]
+        stats = self.domain_stats.get(domain)
+        if stats is not None:
             
             # Check if in bypass period
-            if stats.bypass_until and datetime.now() < stats.bypass_until:
+            if stats.bypass_until and time.monotonic() < stats.bypass_until:
                 return True
                 
             # Check failure threshold
@@ -356,12 +486,19 @@ class EnhancedDNSProxy:
         if not self.config.intelligent_caching:
             return
             
-        now = datetime.now()
+        now = time.monotonic()
         
-        if domain not in self.domain_stats:
-            self.domain_stats[domain] = DomainStats()
-            
-        stats = self.domain_stats[domain]
+        # The entry stays in place while it is marked most recently used, so
+        # concurrent readers never see the domain missing
+        stats = self.domain_stats.get(domain)
+        if stats is None:
+            stats = self.domain_stats.setdefault(domain, DomainStats())
+        else:
+            try:
+                self.domain_stats.move_to_end(domain)
+            except KeyError:
+                # Evicted by another thread in the meantime; keep the counters
+                self.domain_stats[domain] = stats
         stats.total_queries += 1
         
         if resolver == 'unbound':
@@ -376,30 +513,20 @@ class EnhancedDNSProxy:
                 
                 # Set bypass period if threshold reached
                 if stats.consecutive_failures >= self.config.fallback_threshold:
-                    stats.bypass_until = now + timedelta(seconds=self.config.bypass_duration)
+                    stats.bypass_until = now + self.config.bypass_duration
                     self.logger.warning(f"Domain {domain} bypassed for {self.config.bypass_duration}s due to repeated Unbound failures")
         
         # Limit cache size
         if len(self.domain_stats) > self.config.max_domain_cache:
-            # Remove oldest entries (simple LRU approximation)
-            oldest_domain = min(self.domain_stats.keys(), 
-                              key=lambda d: self.domain_stats[d].total_queries)
-            del self.domain_stats[oldest_domain]
+            # Evict the least recently used domain
+            self.domain_stats.popitem(last=False)
 
     def _log_query_metric(self, domain: str, client_ip: str, resolver: str, 
                          response_time: float, query_type: str, success: bool):
         """Log structured query metrics"""
-        metric = QueryMetrics(
-            domain=domain,
-            client_ip=client_ip,
-            resolver=resolver,
-            response_time=response_time,
-            query_type=query_type,
-            timestamp=datetime.now(),
-            success=success
-        )
-        
-        self.metrics_log.append(metric)
+        self.metrics_log.append(QueryMetrics(
+            domain, client_ip, resolver, response_time, query_type, time.time(), success
+        ))
         
         if self.config.structured_logging:
             self.logger.info("DNS_QUERY", extra={
@@ -412,24 +539,53 @@ class EnhancedDNSProxy:
             })
 
     def _send_dns_query(self, dns_server: str, query_data: bytes, timeout: float = 2.0) -> Optional[bytes]:
-        """Send DNS query with enhanced error handling and metrics"""
+        """Send DNS query with enhanced error handling and metrics
+
+        Sockets come from a per-upstream pool and are connected to the
+        upstream, so the kernel drops datagrams from anyone else. A pooled
+        socket may still hold a late answer to an earlier query, so only a
+        reply carrying this query's ID is accepted, and sockets that timed
+        out or failed are closed instead of being returned to the pool.
+        """
         host, port = self._parse_addr(dns_server)
+        pool = self._udp_pool.get(dns_server)
         start_time = time.time()
+        sock = None
         
         try:
-            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-                sock.settimeout(timeout)
-                sock.sendto(query_data, (host, port))
-                response = sock.recvfrom(self.config.buffer_size)[0]
-                response_time = time.time() - start_time
-                
-                # Validate response
+            try:
+                sock = pool.get_nowait() if pool is not None else None
+            except queue.Empty:
+                pass
+            if sock is None:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                sock.connect((host, port))
+            
+            deadline = time.monotonic() + timeout
+            sock.settimeout(timeout)
+            sock.send(query_data)
+            while True:
+                response = sock.recv(self.config.buffer_size)
+                if response[:2] == query_data[:2]:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout("timed out")
+                sock.settimeout(remaining)
+            response_time = time.time() - start_time
+            
+            # Validate response: a full header with the QR bit set
+            if len(response) < 12 or not response[2] & 0x80:
+                self.logger.warning(f"Invalid DNS response from {dns_server}")
+                response = None
+            
+            if pool is not None:
                 try:
-                    DNSRecord.parse(response)
-                    return response
-                except DNSError:
-                    self.logger.warning(f"Invalid DNS response from {dns_server}")
-                    return None
+                    pool.put_nowait(sock)
+                    sock = None
+                except queue.Full:
+                    pass
+            return response
                     
         except socket.timeout:
             response_time = time.time() - start_time
@@ -440,6 +596,9 @@ class EnhancedDNSProxy:
         except Exception as e:
             response_time = time.time() - start_time
             self.logger.error(f"Unexpected error querying {dns_server}: {e}")
+        finally:
+            if sock is not None:
+                sock.close()
             
         return None
 
@@ -503,38 +662,101 @@ class EnhancedDNSProxy:
                     else:
                         self.logger.critical("All DNS servers failed health checks!")
 
-    def _get_servfail_response(self, original_request: DNSRecord) -> bytes:
-        """Generate SERVFAIL response"""
-        header = DNSHeader(
-            id=original_request.header.id,
-            qr=1, opcode=original_request.header.opcode, rcode=RCODE.SERVFAIL
-        )
-        return DNSRecord(header, q=original_request.q).pack()
+    def _get_cached_response(self, query_data: bytes) -> Optional[bytes]:
+        """Return a cached answer for the query with its ID and TTLs adjusted, or None"""
+        key = bytes(query_data[2:])
+        entry = self.response_cache.get(key)
+        if entry is None:
+            return None
+        expires, stored, response = entry
+        now = time.monotonic()
+        if now >= expires:
+            self.response_cache.pop(key, None)
+            return None
+        try:
+            # Mark as most recently used without ever removing the entry
+            self.response_cache.move_to_end(key)
+        except KeyError:
+            pass  # evicted by another thread; this answer is still valid to return
+        
+        age = int(now - stored)
+        if age:
+            # Age the TTLs so downstream caches do not keep the answer past its lifetime
+            try:
+                record = DNSRecord.parse(response)
+                for rr in chain(record.rr, record.auth, record.ar):
+                    if rr.rtype != QTYPE.OPT:
+                        rr.ttl = max(0, rr.ttl - age)
+                response = record.pack()
+            except Exception as e:
+                # Drop the entry and let the query go upstream
+                self.response_cache.pop(key, None)
+                self.logger.warning(f"Discarding unusable cached response: {e}")
+                return None
+        return query_data[:2] + response[2:]
 
-    def _handle_query_with_fallback(self, request: DNSRecord, query_data: bytes, client_addr: Tuple[str, int]) -> Optional[bytes]:
+    def _cache_response(self, query_data: bytes, response: bytes):
+        """Cache a good upstream answer for the smallest TTL among its records"""
+        try:
+            record = DNSRecord.parse(response)
+        except DNSError:
+            return
+        if record.header.tc or record.header.rcode not in (RCODE.NOERROR, RCODE.NXDOMAIN):
+            return
+        ttls = [rr.ttl for rr in chain(record.rr, record.auth, record.ar) if rr.rtype != QTYPE.OPT]
+        if not ttls or min(ttls) <= 0:
+            return
+        
+        now = time.monotonic()
+        key = bytes(query_data[2:])
+        self.response_cache.pop(key, None)
+        self.response_cache[key] = (now + min(ttls), now, response)
+        if len(self.response_cache) > self.config.response_cache_size:
+            self.response_cache.popitem(last=False)
+
+    def _get_servfail_response(self, query_data: bytes, question_end: int) -> bytes:
+        """Generate SERVFAIL response from the raw query
+
+        The ID, opcode and first question are copied; QR and RD are set and
+        every other section is empty.
+        """
+        flags = bytes((0x81 | (query_data[2] & 0x78), RCODE.SERVFAIL))
+        return query_data[:2] + flags + b'\x00\x01\x00\x00\x00\x00\x00\x00' + query_data[12:question_end]
+
+    def _handle_query_with_fallback(self, question: Tuple[str, int, int], query_data: bytes, client_addr: Tuple[str, int]) -> Optional[bytes]:
         """Enhanced query handling with intelligent fallback"""
-        domain = str(request.q.qname).rstrip('.')
-        query_type = QTYPE[request.q.qtype]
+        domain, qtype, question_end = question
+        query_type = QTYPE[qtype]
         client_ip = client_addr[0]
         
-        # Query deduplication
+        # Repeated queries are answered from the response cache. Hits are not
+        # logged as DNS_QUERY records: the dashboard's resolver breakdown and
+        # response times describe upstream resolution only.
+        if self.config.response_cache_size > 0:
+            cached = self._get_cached_response(query_data)
+            if cached is not None:
+                self.logger.debug(f"Answered {domain} ({query_type}) from the response cache")
+                return cached
+        
+        # Query deduplication: the first caller resolves, identical concurrent
+        # queries wait for its answer
+        flight = None
         if self.config.enable_query_deduplication:
             query_key = f"{domain}:{query_type}"
+            with self._pending_lock:
+                in_flight = self.pending_queries.get(query_key)
+                if in_flight is None:
+                    flight = self.pending_queries[query_key] = (threading.Event(), [])
             
-            # Check if same query is already in progress
-            if query_key in self.pending_queries:
-                # Wait for the other query to complete
-                self.pending_queries[query_key].wait(timeout=5.0)
-                if query_key in self.query_results:
-                    result = self.query_results[query_key]
-                    del self.query_results[query_key]
-                    return result
-            else:
-                # Mark this query as in progress
-                self.pending_queries[query_key] = threading.Event()
+            if in_flight is not None:
+                done, shared = in_flight
+                if done.wait(timeout=5.0) and shared[0] is not None:
+                    # Same answer, under this client's transaction ID
+                    return query_data[:2] + shared[0][2:]
+                # The other query failed or is stuck; resolve independently
         
+        response_data = None
         try:
-            response_data = None
             resolver_used = 'none'
             start_time = time.time()
             
@@ -572,7 +794,7 @@ class EnhancedDNSProxy:
             
             # Generate SERVFAIL if all failed
             if not response_data:
-                response_data = self._get_servfail_response(request)
+                response_data = self._get_servfail_response(query_data, question_end)
                 resolver_used = 'servfail'
             
             # Log metrics
@@ -580,30 +802,33 @@ class EnhancedDNSProxy:
             success = resolver_used not in ['servfail', 'none']
             self._log_query_metric(domain, client_ip, resolver_used, response_time, query_type, success)
             
-            # Handle query deduplication cleanup
-            if self.config.enable_query_deduplication:
-                query_key = f"{domain}:{query_type}"
-                if query_key in self.pending_queries:
-                    self.query_results[query_key] = response_data
-                    self.pending_queries[query_key].set()
-                    # Clean up after a short delay
-                    threading.Timer(1.0, lambda: self.pending_queries.pop(query_key, None)).start()
+            if success and self.config.response_cache_size > 0:
+                self._cache_response(query_data, response_data)
             
             return response_data
             
         except Exception as e:
             self.logger.error(f"Error handling query for {domain}: {e}")
-            return self._get_servfail_response(request)
+            response_data = None
+            return self._get_servfail_response(query_data, question_end)
+        finally:
+            if flight is not None:
+                # Publish the answer and retire the entry so later queries start afresh
+                done, shared = flight
+                shared.append(response_data)
+                with self._pending_lock:
+                    del self.pending_queries[query_key]
+                done.set()
 
     def _handle_udp_request(self, data: bytes, client_addr: Tuple[str, int]):
         """Handle UDP DNS request with enhanced processing"""
         try:
-            request = DNSRecord.parse(data)
+            question = parse_question(data)
         except DNSError:
             self.logger.warning(f"Malformed UDP DNS query from {client_addr}")
             return
             
-        response_data = self._handle_query_with_fallback(request, data, client_addr)
+        response_data = self._handle_query_with_fallback(question, data, client_addr)
         
         if self.udp_sock and response_data:
             try:
@@ -631,8 +856,8 @@ class EnhancedDNSProxy:
                     self.logger.warning(f"Incomplete TCP query from {client_addr}")
                     return
                 
-                request = DNSRecord.parse(data)
-                response_data = self._handle_query_with_fallback(request, data, client_addr)
+                question = parse_question(data)
+                response_data = self._handle_query_with_fallback(question, data, client_addr)
                 
                 if response_data:
                     response_with_len = len(response_data).to_bytes(2, 'big') + response_data
@@ -652,9 +877,15 @@ class EnhancedDNSProxy:
             self.udp_sock.bind(addr)
             self.udp_sock.settimeout(1.0)  # Allow periodic checks for shutdown
             
+            # Receive into one reusable buffer; only the datagram itself is
+            # copied out for the worker thread
+            recv_buf = bytearray(self.config.buffer_size)
+            recv_view = memoryview(recv_buf)
+            
             while not self._shutdown_event.is_set():
                 try:
-                    data, client_addr = self.udp_sock.recvfrom(self.config.buffer_size)
+                    nbytes, client_addr = self.udp_sock.recvfrom_into(recv_buf)
+                    data = bytes(recv_view[:nbytes])
                     self.executor.submit(self._handle_udp_request, data, client_addr)
                 except socket.timeout:
                     continue  # Check shutdown event
@@ -716,20 +947,19 @@ class EnhancedDNSProxy:
             unbound_success = sum(1 for m in self.metrics_log if m.resolver == 'unbound' and m.success)
             fallback_usage = sum(1 for m in self.metrics_log if m.resolver == 'fallback')
             bypassed_queries = sum(1 for m in self.metrics_log if m.resolver == 'bypassed')
+            now = time.monotonic()
             
-            # Top failing domains
-            domain_failures = defaultdict(int)
-            for domain, stats in self.domain_stats.items():
-                if stats.consecutive_failures >= 2:
-                    domain_failures[domain] = stats.consecutive_failures
-            
-            top_failing = sorted(domain_failures.items(), key=lambda x: x[1], reverse=True)[:10]
+            # Top failing domains; a bounded heap instead of sorting every entry
+            domain_failures = ((domain, stats.consecutive_failures)
+                               for domain, stats in self.domain_stats.items()
+                               if stats.consecutive_failures >= 2)
+            top_failing = heapq.nlargest(10, domain_failures, key=operator.itemgetter(1))
             
             return {
                 'total_queries': total_queries,
                 'unbound_success_rate': (unbound_success / max(1, sum(1 for m in self.metrics_log if m.resolver == 'unbound'))) * 100,
                 'fallback_usage': (fallback_usage / total_queries) * 100,
-                'bypassed_domains': len([d for d, s in self.domain_stats.items() if s.bypass_until and datetime.now() < s.bypass_until]),
+                'bypassed_domains': len([d for d, s in self.domain_stats.items() if s.bypass_until and now < s.bypass_until]),
                 'current_dns': self._current_dns,
                 'top_failing_domains': top_failing,
                 'average_response_time': sum(m.response_time for m in self.metrics_log) / total_queries,
@@ -759,6 +989,12 @@ class EnhancedDNSProxy:
         self.executor.shutdown(wait=True)
         
         # Close sockets
+        for pool in self._udp_pool.values():
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
         if self.tcp_sock:
             self.tcp_sock.close()
         if self.udp_sock:
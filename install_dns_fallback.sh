@@ -385,6 +385,16 @@ setup_virtual_environment() {
         fi
     done
     
+    # Optional production WSGI server for the dashboard
+    if ! "$venv_pip" install waitress; then
+        print_warning "Failed to install waitress; the dashboard will use Flask's built-in server"
+    fi
+    
+    # Optional faster JSON for structured logs (proxy writes, dashboard reads)
+    if ! "$venv_pip" install orjson; then
+        print_warning "Failed to install orjson; falling back to the standard json module"
+    fi
+    
     print_success "Virtual environment setup completed"
 }
 
@@ -472,6 +482,8 @@ bypass_duration = 3600
 # Query optimization
 # Enable deduplication of identical concurrent queries
 enable_query_deduplication = true
+# Number of upstream answers to cache, each for its record TTL (0 disables)
+response_cache_size = 1000
 
 # Logging configuration
 # Enable structured JSON logging for better dashboard integration
@@ -7,7 +7,7 @@ import time
 import logging
 import signal
 import sys
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 
 # You need: pip install dnslib
 from dnslib import DNSRecord, DNSHeader, DNSQuestion, DNSError
@@ -28,6 +28,7 @@ FALLBACK_DNS: List[Tuple[str, int]] = [
 UDP_TIMEOUT = 1.0            # seconds per try for UDP
 TCP_TIMEOUT = 2.0            # seconds per try for TCP
 RETRIES_PER_UPSTREAM = 1     # how many extra attempts per upstream server
+UDP_POOL_SIZE = 16           # idle UDP sockets kept open per upstream server
 
 LOG_LEVEL = logging.INFO     # DEBUG for more verbosity
 LOG_FORMAT = "[%(asctime)s] %(levelname)s %(message)s"
@@ -39,20 +40,89 @@ logger = logging.getLogger("dns-failover-proxy")
 
 _shutdown = threading.Event()
 
+# Idle connected UDP sockets per upstream, reused across queries
+_udp_pool: Dict[Tuple[str, int], List[socket.socket]] = {}
+_udp_pool_lock = threading.Lock()
+
+
+def _udp_acquire(upstream: Tuple[str, int]) -> socket.socket:
+    """
+    Take an idle UDP socket connected to upstream, or open a new one.
+    """
+    with _udp_pool_lock:
+        idle = _udp_pool.get(upstream)
+        if idle:
+            return idle.pop()
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(upstream)
+    except OSError:
+        s.close()
+        raise
+    return s
+
+
+def _udp_release(upstream: Tuple[str, int], s: socket.socket) -> None:
+    """
+    Return a socket to the pool, or close it if the pool is full.
+    """
+    with _udp_pool_lock:
+        idle = _udp_pool.setdefault(upstream, [])
+        if len(idle) < UDP_POOL_SIZE:
+            idle.append(s)
+            return
+    s.close()
+
 
 def _udp_query(upstream: Tuple[str, int], payload: bytes, timeout: float) -> Optional[bytes]:
     """
     Send a DNS query over UDP. Return response bytes or None on timeout/error.
+
+    Sockets are pooled and connected, so only the upstream can answer on
+    them. A socket that timed out or failed is closed rather than pooled,
+    and answers carrying another transaction ID are skipped, so a late reply
+    can never be returned for a different query.
     """
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-            s.settimeout(timeout)
-            s.sendto(payload, upstream)
-            data, _ = s.recvfrom(4096)
-            return data
+        s = _udp_acquire(upstream)
+    except OSError as e:
+        logger.debug(f"UDP query to {upstream} failed: {e}")
+        return None
+    try:
+        deadline = time.monotonic() + timeout
+        s.settimeout(timeout)
+        s.send(payload)
+        while True:
+            data = s.recv(4096)
+            if data[:2] == payload[:2]:
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            s.settimeout(remaining)
     except (socket.timeout, OSError) as e:
+        s.close()
         logger.debug(f"UDP query to {upstream} failed: {e}")
         return None
+    _udp_release(upstream, s)
+    return data
+
+
+def _is_query(data: bytes) -> bool:
+    """
+    Cheap wire-format check of a client packet: a full header, the QR bit
+    clear (a query, not a response) and at least one question. The payload
+    itself is forwarded unchanged, so nothing else needs decoding.
+    """
+    return len(data) >= 12 and not data[2] & 0x80 and (data[4] or data[5]) != 0
+
+
+def _qname_for_log(data: bytes) -> str:
+    try:
+        q = DNSRecord.parse(data)
+        return str(q.q.qname) if q.q else "<?>"
+    except DNSError:
+        return "<?>"
 
 
 def _tcp_query(upstream: Tuple[str, int], payload: bytes, timeout: float) -> Optional[bytes]:
@@ -91,19 +161,18 @@ def _try_upstream(upstream: Tuple[str, int], query: bytes) -> Optional[bytes]:
     if udp_resp is None:
         return None
 
-    # Check TC bit (truncated). If set, retry via TCP to same upstream.
-    try:
-        dns = DNSRecord.parse(udp_resp)
-        if dns.header.tc:  # truncated
-            logger.debug(f"Truncated UDP response from {upstream}; retrying via TCP")
-            tcp_resp = _tcp_query(upstream, query, TCP_TIMEOUT)
-            return tcp_resp or udp_resp  # fallback to UDP resp if TCP fails
-        return udp_resp
-    except DNSError:
-        # If parsing failed, still try TCP as a last-ditch attempt
-        logger.debug(f"Failed to parse UDP response from {upstream}; trying TCP")
+    # Check TC bit (truncated) straight from the header flags; if set,
+    # retry via TCP to same upstream.
+    if len(udp_resp) < 12:
+        # Not even a full header; still try TCP as a last-ditch attempt
+        logger.debug(f"Short UDP response from {upstream}; trying TCP")
         tcp_resp = _tcp_query(upstream, query, TCP_TIMEOUT)
         return tcp_resp
+    if udp_resp[2] & 0x02:  # truncated
+        logger.debug(f"Truncated UDP response from {upstream}; retrying via TCP")
+        tcp_resp = _tcp_query(upstream, query, TCP_TIMEOUT)
+        return tcp_resp or udp_resp  # fallback to UDP resp if TCP fails
+    return udp_resp
 
 
 def resolve_with_failover(query: bytes) -> Optional[bytes]:
@@ -128,10 +197,11 @@ class UDPHandler(socketserver.BaseRequestHandler):
         data, sock = self.request
         client = self.client_address
         try:
-            # Parse once for logging/ID; keep original payload for upstream
-            q = DNSRecord.parse(data)
-            qname = str(q.q.qname) if q.q else "<?>"
-            logger.debug(f"UDP query from {client}: {qname}")
+            # Only the header is checked; the original payload goes upstream
+            if not _is_query(data):
+                raise DNSError("not a DNS query")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"UDP query from {client}: {_qname_for_log(data)}")
 
             resp = resolve_with_failover(data)
             if resp:
@@ -166,9 +236,10 @@ class TCPHandler(socketserver.StreamRequestHandler):
             if len(payload) < length:
                 return
 
-            q = DNSRecord.parse(payload)
-            qname = str(q.q.qname) if q.q else "<?>"
-            logger.debug(f"TCP query from {client}: {qname}")
+            if not _is_query(payload):
+                raise DNSError("not a DNS query")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"TCP query from {client}: {_qname_for_log(payload)}")
 
             resp = resolve_with_failover(payload)
             if resp is None: